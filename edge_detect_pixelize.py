@@ -77,17 +77,13 @@ def detect_edges(image: np.ndarray, threshold: float) -> tuple[np.ndarray, np.nd
     # 转换为灰度图
     gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
 
-    # 计算梯度
-    sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    # 计算梯度（int16 足够，避免 float64 的内存带宽开销）
+    sobel_x = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+    sobel_y = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
 
-    # 归一化到 0-1
-    sobel_x = np.abs(sobel_x) / np.max(sobel_x)
-    sobel_y = np.abs(sobel_y) / np.max(sobel_y)
-
-    # 应用阈值
-    edges_x = (sobel_x > threshold).astype(np.uint8)
-    edges_y = (sobel_y > threshold).astype(np.uint8)
+    # 应用阈值（|G| > threshold * max 等价于先归一化再比较）
+    edges_x = (np.abs(sobel_x) > threshold * sobel_x.max()).astype(np.uint8)
+    edges_y = (np.abs(sobel_y) > threshold * sobel_y.max()).astype(np.uint8)
 
     return edges_x, edges_y
 